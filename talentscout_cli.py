@@ -0,0 +1,417 @@
+"""
+TalentScout AI Pro - headless screening
+
+Runs the same extract -> analyze -> save pipeline as the Streamlit app, without
+Streamlit, for bulk imports and ATS integrations.
+
+    python talentscout_cli.py screen --job jd.txt --dir resumes/ --concurrency 8 --out results.jsonl
+    python talentscout_cli.py screen --job jd.txt --zip resumes.zip --out results.jsonl
+    python talentscout_cli.py serve --port 8502
+    python talentscout_cli.py archive --older-than-days 180
+    python talentscout_cli.py migrate
+
+Results are streamed as JSON lines in completion order. `screen` appends every
+finished file to a checkpoint file so an interrupted run can be resumed by
+re-running the same command.
+"""
+
+import os
+import sys
+import json
+import hmac
+import base64
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from talentscout_core import (
+    ResumeFile,
+    archive_cold_resumes,
+    count_zip_resumes,
+    iter_zip_resumes,
+    init_database,
+    get_setting,
+    load_resume_file,
+    model_stats,
+    refresh_analytics,
+    save_job,
+    screen_resume,
+)
+from talentscout_scheduler import get_scheduler
+
+logger = logging.getLogger("talentscout.cli")
+
+RESUME_EXTENSIONS = (".pdf", ".txt", ".docx")
+
+# Statuses that are final - anything else (e.g. a failed AI call or a failed
+# save) is retried on resume. "skipped" ZIP members are too large or corrupt.
+CHECKPOINT_STATUSES = ("ok", "no_text", "skipped")
+
+# =============================================================================
+# PIPELINE RUNNER
+# =============================================================================
+
+def run_bounded(items, fn, concurrency):
+    """Apply fn to items on a thread pool, yielding (item, result) as each completes.
+
+    At most `concurrency` items are in flight and `items` is consumed lazily,
+    so large batches never queue thousands of pending futures (or spooled
+    files) up front.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        for item in items:
+            pending[executor.submit(fn, item)] = item
+            if len(pending) >= concurrency:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    name = item.get("filename") if isinstance(item, dict) else getattr(item, "name", str(item))
+                    result = {"file": name, "status": "error", "error": str(e)}
+                yield item, result
+
+                next_item = next(items, None)
+                if next_item is not None:
+                    pending[executor.submit(fn, next_item)] = next_item
+
+def find_resumes(directory):
+    """List resume files under a directory, in a stable order"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.lower().endswith(RESUME_EXTENSIONS):
+                paths.append(os.path.join(root, filename))
+    return sorted(paths)
+
+# =============================================================================
+# CHECKPOINTS
+# =============================================================================
+
+def load_checkpoint(path):
+    """Read a checkpoint file, returning (job_id, set of finished files)"""
+    job_id, done = None, set()
+    if not os.path.exists(path):
+        return job_id, done
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted write
+                continue
+            if "job_id" in entry:
+                job_id = entry["job_id"]
+            if "done" in entry:
+                done.add(entry["done"])
+    return job_id, done
+
+def append_checkpoint(f, **entry):
+    """Append one entry to an open checkpoint file and flush it to disk"""
+    f.write(json.dumps(entry) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+# =============================================================================
+# COMMANDS
+# =============================================================================
+
+def cmd_screen(args):
+    """Screen a directory or ZIP archive of resumes against one job description"""
+    with open(args.job, encoding="utf-8") as f:
+        job_description = f.read()
+    title = args.title or os.path.splitext(os.path.basename(args.job))[0]
+
+    checkpoint_path = args.checkpoint or f"{args.out}.checkpoint"
+    job_id, done = load_checkpoint(checkpoint_path)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            open(args.out, "a", encoding="utf-8") as out, \
+            open(args.zip or os.devnull, "rb") as archive:
+        if args.user_id is not None:
+            init_database()
+            if job_id is None:
+                job_id = save_job(args.user_id, title, job_description)
+                if job_id is None:
+                    logger.error("Failed to save job - aborting")
+                    return 1
+                append_checkpoint(checkpoint, job_id=job_id)
+
+        # Groq calls share the fair-share scheduler (and, with a database, its
+        # cross-process limits) with the app and API, as bulk work: at most
+        # TENANT_CONCURRENCY (or this tenant's TENANT_CONCURRENCY_LIMITS entry)
+        # calls run at once, whatever --concurrency is
+        scheduler = get_scheduler()
+        tenant_id = args.user_id if args.user_id is not None else "cli"
+        logger.info("Groq calls for tenant %s are limited to %d at a time", tenant_id,
+                    int(scheduler.tenant_limits.get(str(tenant_id), scheduler.tenant_concurrency)))
+
+        def screen(resume):
+            return screen_resume(resume, job_description, job_id, args.user_id, with_details=args.details,
+                                 scheduler=scheduler, tenant_id=tenant_id, batch_size=total)
+
+        counts = {"completed": 0, "failed": 0, "skipped": 0}
+
+        def write_record(record):
+            record["job_id"] = job_id
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if record["status"] == "skipped":
+                append_checkpoint(checkpoint, done=record["file"])
+                counts["skipped"] += 1
+            elif record["status"] in CHECKPOINT_STATUSES:
+                append_checkpoint(checkpoint, done=record["file"])
+                counts["completed"] += 1
+            else:
+                counts["failed"] += 1
+
+        def skip_member(filename, reason):
+            write_record({"file": filename, "status": "skipped", "candidate_id": None,
+                          "analysis": None, "error": reason})
+
+        if args.zip:
+            # Members are spooled one at a time as worker slots free up
+            total = count_zip_resumes(archive)
+            items = iter_zip_resumes(archive, skip=done, on_skip=skip_member)
+
+            def process(resume):
+                with resume:
+                    return screen(resume)
+        else:
+            items = [p for p in find_resumes(args.dir) if os.path.relpath(p, args.dir) not in done]
+            total = len(items) + len(done)
+
+            def process(path):
+                with load_resume_file(path) as resume:
+                    record = screen(resume)
+                record["file"] = os.path.relpath(path, args.dir)
+                return record
+
+        logger.info("%d resumes found (%d already done)", total, len(done))
+
+        try:
+            for _, record in run_bounded(items, process, args.concurrency):
+                write_record(record)
+        finally:
+            # Drop this run's rows from the shared limits now (e.g. on Ctrl-C)
+            # instead of leaving them to expire
+            scheduler.shutdown(wait=False)
+
+    logger.info("Done: %d screened, %d skipped, %d failed (re-run to retry failures)",
+                counts["completed"], counts["skipped"], counts["failed"])
+    if job_id is not None:
+        refresh_analytics()
+    for row in model_stats.snapshot():
+        logger.info("Model stats: %s", json.dumps(row))
+    return 0 if counts["failed"] == 0 else 2
+
+class ScreeningHandler(BaseHTTPRequestHandler):
+    """Minimal JSON API around screen_resume
+
+    POST /screen with {"job_description": str, "job_title": str?, "user_id": int?,
+    "details": bool?, "resumes": [{"filename": str, "content_base64": str}]} streams one JSON line
+    per resume as it completes. GET /stats returns per-model latency and tokens
+    and per-tenant queue depth and wait times. Both require a bearer token
+    (see _caller) when any is configured; GET /health does not.
+    """
+
+    concurrency = 4
+    api_token = None
+    # SCREENING_API_TOKENS: {"<token>": user_id}, one token per company
+    user_tokens = {}
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _caller(self):
+        """Authenticate the bearer token, returning (authorized, user_id).
+
+        A SCREENING_API_TOKENS token acts only as its company's user_id. The
+        shared SCREENING_API_TOKEN (user_id None) is the operator: it sees all
+        tenants' stats but cannot save under a company. A server without any
+        token (localhost only) trusts the request.
+        """
+        if not self.api_token and not self.user_tokens:
+            return True, None
+        header = self.headers.get("Authorization", "")
+        for token, user_id in self.user_tokens.items():
+            if hmac.compare_digest(header, f"Bearer {token}"):
+                return True, user_id
+        if self.api_token and hmac.compare_digest(header, f"Bearer {self.api_token}"):
+            return True, None
+        return False, None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            # Company tokens only see their own tenant
+            authorized, token_user = self._caller()
+            if not authorized:
+                self._send_json(401, {"error": "unauthorized"})
+                return
+            self._send_json(200, {"models": model_stats.snapshot(),
+                                  "tenants": get_scheduler().stats(token_user)})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/screen":
+            self._send_json(404, {"error": "not found"})
+            return
+        authorized, token_user = self._caller()
+        if not authorized:
+            self._send_json(401, {"error": "unauthorized"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            job_description = request["job_description"]
+            resumes = request["resumes"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"invalid request: {e}"})
+            return
+
+        user_id = request.get("user_id", token_user)
+        if token_user is not None and user_id != token_user:
+            self._send_json(403, {"error": "this token cannot act for that user_id"})
+            return
+        if token_user is None and user_id is not None and (self.api_token or self.user_tokens):
+            self._send_json(403, {"error": "saving results needs the company's token from SCREENING_API_TOKENS"})
+            return
+
+        job_id = None
+        if user_id is not None:
+            job_id = save_job(user_id, request.get("job_title", "API screening"), job_description)
+            if job_id is None:
+                self._send_json(500, {"error": "failed to save job"})
+                return
+
+        with_details = bool(request.get("details", False))
+
+        # Requests from different companies share the Groq key through the
+        # fair-share scheduler; anonymous requests share one "api" tenant
+        scheduler = get_scheduler()
+        tenant_id = user_id if user_id is not None else "api"
+
+        def process(resume):
+            resume_file = ResumeFile(base64.b64decode(resume["content_base64"]), resume["filename"])
+            return screen_resume(resume_file, job_description, job_id, user_id, with_details,
+                                 scheduler=scheduler, tenant_id=tenant_id, batch_size=len(resumes))
+
+        # HTTP/1.0 response without Content-Length: lines are flushed as they
+        # complete and the connection is closed at the end.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for _, record in run_bounded(resumes, process, self.concurrency):
+            record["job_id"] = job_id
+            self.wfile.write((json.dumps(record) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        if job_id is not None:
+            refresh_analytics()
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+def cmd_serve(args):
+    """Run the HTTP screening API"""
+    init_database()
+    ScreeningHandler.concurrency = args.concurrency
+    ScreeningHandler.api_token = get_setting("SCREENING_API_TOKEN")
+    ScreeningHandler.user_tokens = json.loads(get_setting("SCREENING_API_TOKENS", "{}"))
+    if not (ScreeningHandler.api_token or ScreeningHandler.user_tokens) \
+            and args.host not in ("127.0.0.1", "localhost"):
+        logger.error("Set SCREENING_API_TOKENS (or SCREENING_API_TOKEN) before binding to a public interface")
+        return 1
+
+    server = ThreadingHTTPServer((args.host, args.port), ScreeningHandler)
+    logger.info("Serving on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+def cmd_archive(args):
+    """Retention job: archive cold resume text and create upcoming partitions"""
+    init_database()
+    archived = archive_cold_resumes(args.older_than_days, batch_size=args.batch_size)
+    logger.info("Retention job done: %d resumes archived", archived)
+    return 0
+
+def cmd_migrate(args):
+    """Apply schema migrations (run on deploy, before starting the app)"""
+    return 0 if init_database() else 1
+
+def cmd_refresh_analytics(args):
+    """Refresh the analytics materialized views (e.g. from cron)"""
+    return 0 if refresh_analytics(min_interval=args.min_interval) else 1
+
+# =============================================================================
+# ENTRY POINT
+# =============================================================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="TalentScout AI Pro headless screening")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    screen = subparsers.add_parser("screen", help="Screen a directory or ZIP archive of resumes")
+    screen.add_argument("--job", required=True, help="Text file with the job description")
+    source = screen.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of PDF/DOCX/TXT resumes")
+    source.add_argument("--zip", help="ZIP archive of resumes (streamed member by member)")
+    screen.add_argument("--title", help="Job title (defaults to the job file name)")
+    screen.add_argument("--user-id", type=int, help="Save the job and candidates for this user")
+    screen.add_argument("--concurrency", type=int, default=4,
+                        help="Resumes extracted and in flight at once; parallel Groq calls are further "
+                             "capped by TENANT_CONCURRENCY / TENANT_CONCURRENCY_LIMITS")
+    screen.add_argument("--out", default="results.jsonl", help="JSONL output file (appended)")
+    screen.add_argument("--checkpoint", help="Checkpoint file (defaults to <out>.checkpoint)")
+    screen.add_argument("--details", action="store_true",
+                        help="Also run the detail pass (strengths, concerns, questions) for every resume")
+    screen.set_defaults(func=cmd_screen)
+
+    serve = subparsers.add_parser("serve", help="Run the HTTP screening API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8502)
+    serve.add_argument("--concurrency", type=int, default=4, help="Resumes analyzed in parallel per request")
+    serve.set_defaults(func=cmd_serve)
+
+    archive = subparsers.add_parser("archive", help="Compress resume text older than the retention age into the archive")
+    archive.add_argument("--older-than-days", type=int, help="Retention age (defaults to ARCHIVE_AFTER_DAYS or 180)")
+    archive.add_argument("--batch-size", type=int, default=500, help="Candidates archived per transaction")
+    archive.set_defaults(func=cmd_archive)
+
+    migrate = subparsers.add_parser("migrate", help="Create or upgrade the database schema")
+    migrate.set_defaults(func=cmd_migrate)
+
+    refresh = subparsers.add_parser("refresh-analytics", help="Refresh the analytics materialized views")
+    refresh.add_argument("--min-interval", type=int, default=0,
+                         help="Skip if refreshed less than this many seconds ago (default: always refresh)")
+    refresh.set_defaults(func=cmd_refresh_analytics)
+
+    return parser
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,608 @@
+"""
+TalentScout AI Pro - fair-share scheduling of analysis work
+
+All companies share one GROQ_API_KEY, so analysis calls from every tenant go
+through a FairShareScheduler instead of straight to Groq:
+
+- each tenant (user_id) has its own queue, served by deficit round robin with
+  optional per-tenant weights, so a 1,000-resume upload cannot starve a
+  3-resume screening
+- small (interactive) batches and on-demand detail passes go in a priority
+  tier that is always served before bulk work
+- per-tenant concurrency caps and daily quotas
+- queue depth and wait times per tenant via stats()
+
+The app, the API server and CLI runs are separate processes. When a database
+is configured, every scheduler also registers its tasks in a shared
+SchedulerStore (the scheduler_tasks / scheduler_usage tables) and only starts
+a task once the store admits it, so the global concurrency limit, per-tenant
+caps, interactive priority and daily quotas hold across all processes.
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from datetime import date
+from talentscout_core import get_db_connection, get_setting
+
+logger = logging.getLogger("talentscout.scheduler")
+
+DEFAULT_WORKERS = 4
+DEFAULT_TENANT_CONCURRENCY = 2
+DEFAULT_INTERACTIVE_BATCH_SIZE = 10
+DEFAULT_INTERACTIVE_RESERVED_SLOTS = 1
+
+TIERS = ("interactive", "bulk")
+
+# How often a worker whose task was not admitted checks the store again
+ADMISSION_POLL_INTERVAL = 0.5
+
+# Processes refresh heartbeat_at of their tasks this often; tasks of a process
+# that has not done so for TASK_STALE_AFTER seconds (crashed) are dropped
+HEARTBEAT_INTERVAL = 30
+TASK_STALE_AFTER = 300
+
+# pg_advisory_xact_lock key that serializes admission decisions
+SCHEDULER_LOCK_ID = 7261003
+
+class QuotaExceededError(Exception):
+    """Raised (through the task's future) when a tenant has used its daily quota"""
+
+class StoreUnavailableError(Exception):
+    """The shared scheduler store could not be reached"""
+
+class _Task:
+    __slots__ = ("future", "fn", "args", "kwargs", "tier", "enqueued_at", "store_id")
+
+    def __init__(self, fn, args, kwargs, tier):
+        self.future = Future()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.tier = tier
+        self.enqueued_at = time.monotonic()
+        self.store_id = None
+
+class _Tenant:
+    def __init__(self, weight, concurrency):
+        self.weight = weight
+        self.concurrency = concurrency
+        self.queues = {tier: deque() for tier in TIERS}
+        self.deficit = {tier: 0.0 for tier in TIERS}
+        self.running = 0
+        self.completed = 0
+        self.quota_day = date.today()
+        self.quota_used = 0
+        self.waits = deque(maxlen=200)
+
+# =============================================================================
+# SHARED STORE
+# =============================================================================
+
+class SchedulerStore:
+    """Admission state shared by every process through PostgreSQL
+
+    Each queued or running task has a row in scheduler_tasks, and
+    scheduler_usage counts each tenant's analyses per day. Admission decisions
+    are serialized by an advisory lock; they are a few small queries, so the
+    lock is held for milliseconds, never during a Groq call.
+    """
+
+    def __init__(self, global_concurrency, tenant_concurrency,
+                 reserved_interactive=DEFAULT_INTERACTIVE_RESERVED_SLOTS, weights=None, tenant_limits=None):
+        self.global_concurrency = global_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.reserved_interactive = max(min(reserved_interactive, global_concurrency - 1), 0)
+        self.weights = weights or {}
+        self.tenant_limits = tenant_limits or {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _transaction(self, fn):
+        conn = get_db_connection()
+        if not conn:
+            raise StoreUnavailableError("no database connection")
+        try:
+            with conn.cursor() as cur:
+                result = fn(cur)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def _weight(self, tenant_id):
+        return max(float(self.weights.get(tenant_id, 1.0)), 0.01)
+
+    def _cap(self, tenant_id):
+        return int(self.tenant_limits.get(tenant_id, self.tenant_concurrency))
+
+    def enqueue(self, tenant_id, tier, daily_quota=None):
+        """Count one analysis against today's quota and register the task.
+
+        Returns the task id, or None when the tenant's quota is used up.
+        """
+        def run(cur):
+            cur.execute("""
+                INSERT INTO scheduler_usage (tenant_id, day, used) VALUES (%s, CURRENT_DATE, 1)
+                ON CONFLICT (tenant_id, day) DO UPDATE SET used = scheduler_usage.used + 1
+                WHERE %s::integer IS NULL OR scheduler_usage.used < %s
+                RETURNING used
+            """, (tenant_id, daily_quota, daily_quota))
+            if cur.fetchone() is None:
+                return None
+            cur.execute(
+                "INSERT INTO scheduler_tasks (tenant_id, tier, owner) VALUES (%s, %s, %s) RETURNING id",
+                (tenant_id, tier, self.owner)
+            )
+            return cur.fetchone()[0]
+        return self._transaction(run)
+
+    def try_start(self, task_id, tenant_id, tier):
+        """Mark a queued task running if the global limits allow it now"""
+        def run(cur):
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEDULER_LOCK_ID,))
+            cur.execute(
+                "DELETE FROM scheduler_tasks WHERE heartbeat_at < LOCALTIMESTAMP - make_interval(secs => %s)",
+                (TASK_STALE_AFTER,)
+            )
+            cur.execute("""
+                SELECT tenant_id,
+                       COUNT(*) FILTER (WHERE status = 'running') AS running,
+                       COALESCE(bool_or(status = 'queued' AND tier = 'interactive'), FALSE),
+                       COALESCE(bool_or(status = 'queued' AND tier = %s), FALSE)
+                FROM scheduler_tasks
+                WHERE id <> %s
+                GROUP BY tenant_id
+            """, (tier, task_id))
+            tenants = {row[0]: row[1:] for row in cur.fetchall()}
+
+            total = sum(running for running, _, _ in tenants.values())
+            mine = tenants.get(tenant_id, (0, False, False))[0]
+            if total >= self.global_concurrency or mine >= self._cap(tenant_id):
+                return False
+            if tier == "bulk" and total >= self.global_concurrency - self.reserved_interactive:
+                return False
+
+            # Leave the slot to a tenant that is further behind its fair share
+            share = mine / self._weight(tenant_id)
+            for other, (running, interactive_waiting, tier_waiting) in tenants.items():
+                if other == tenant_id or running >= self._cap(other):
+                    continue
+                if tier == "bulk" and interactive_waiting:
+                    return False
+                if tier_waiting and running / self._weight(other) < share:
+                    return False
+
+            cur.execute("""
+                UPDATE scheduler_tasks SET status = 'running', started_at = LOCALTIMESTAMP,
+                       heartbeat_at = LOCALTIMESTAMP
+                WHERE id = %s
+            """, (task_id,))
+            if cur.rowcount == 0:
+                # Dropped as stale while this process was stalled - re-register it
+                cur.execute("""
+                    INSERT INTO scheduler_tasks (id, tenant_id, tier, owner, status, started_at)
+                    VALUES (%s, %s, %s, %s, 'running', LOCALTIMESTAMP)
+                """, (task_id, tenant_id, tier, self.owner))
+            return True
+        return self._transaction(run)
+
+    def finish(self, task_id):
+        self._transaction(lambda cur: cur.execute("DELETE FROM scheduler_tasks WHERE id = %s", (task_id,)))
+
+    def cancel(self, task_id, tenant_id):
+        """Drop a task that never started and give its quota back"""
+        def run(cur):
+            cur.execute("DELETE FROM scheduler_tasks WHERE id = %s", (task_id,))
+            cur.execute("""
+                UPDATE scheduler_usage SET used = used - 1
+                WHERE tenant_id = %s AND day = CURRENT_DATE AND used > 0
+            """, (tenant_id,))
+        self._transaction(run)
+
+    def heartbeat(self):
+        self._transaction(lambda cur: cur.execute(
+            "UPDATE scheduler_tasks SET heartbeat_at = LOCALTIMESTAMP WHERE owner = %s", (self.owner,)
+        ))
+
+    def release_all(self):
+        """Drop every task of this process (on shutdown), refunding the quota of those that never started"""
+        self._transaction(lambda cur: cur.execute("""
+            WITH dropped AS (
+                DELETE FROM scheduler_tasks WHERE owner = %s RETURNING tenant_id, status
+            )
+            UPDATE scheduler_usage u SET used = GREATEST(u.used - d.tasks, 0)
+            FROM (
+                SELECT tenant_id, COUNT(*) AS tasks FROM dropped WHERE status = 'queued' GROUP BY tenant_id
+            ) d
+            WHERE u.tenant_id = d.tenant_id AND u.day = CURRENT_DATE
+        """, (self.owner,)))
+
+    def stats(self, tenant_id=None):
+        """Queued/running tasks in all processes and today's usage, by tenant"""
+        def run(cur):
+            cur.execute("""
+                SELECT COALESCE(t.tenant_id, u.tenant_id),
+                       COALESCE(t.queued, 0), COALESCE(t.running, 0), COALESCE(u.used, 0)
+                FROM (
+                    SELECT tenant_id,
+                           COUNT(*) FILTER (WHERE status = 'queued') AS queued,
+                           COUNT(*) FILTER (WHERE status = 'running') AS running
+                    FROM scheduler_tasks
+                    WHERE heartbeat_at >= LOCALTIMESTAMP - make_interval(secs => %s)
+                    GROUP BY tenant_id
+                ) t
+                FULL JOIN (
+                    SELECT tenant_id, used FROM scheduler_usage WHERE day = CURRENT_DATE
+                ) u ON u.tenant_id = t.tenant_id
+                WHERE %s::text IS NULL OR COALESCE(t.tenant_id, u.tenant_id) = %s
+            """, (TASK_STALE_AFTER, tenant_id, tenant_id))
+            return {
+                row[0]: {"queued": row[1], "running": row[2], "quota_used_today": row[3]}
+                for row in cur.fetchall()
+            }
+        return self._transaction(run)
+
+# =============================================================================
+# SCHEDULER
+# =============================================================================
+
+class FairShareScheduler:
+    """Run callables on a fixed worker pool, sharing it fairly between tenants
+
+    With a `store`, limits and quotas are enforced across processes; if the
+    store cannot be reached the scheduler falls back to its local limits.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, tenant_concurrency=DEFAULT_TENANT_CONCURRENCY,
+                 daily_quota=None, interactive_batch_size=DEFAULT_INTERACTIVE_BATCH_SIZE, weights=None,
+                 store=None, tenant_limits=None):
+        self.tenant_concurrency = tenant_concurrency
+        self.daily_quota = daily_quota
+        self.interactive_batch_size = interactive_batch_size
+        self.weights = weights or {}
+        # Per-tenant overrides of tenant_concurrency, keyed by str(tenant_id)
+        self.tenant_limits = tenant_limits or {}
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._tenants = {}
+        # Tenants with queued work, per tier, in round-robin order
+        self._rings = {tier: deque() for tier in TIERS}
+        self._shutdown = False
+        # Separate from _work_available so the heartbeat never consumes a
+        # notify() meant for a worker
+        self._stopped = threading.Event()
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        if store is not None:
+            self._workers.append(threading.Thread(target=self._heartbeat, name="scheduler-heartbeat", daemon=True))
+        for worker in self._workers:
+            worker.start()
+
+    # -------------------------------------------------------------------------
+    # Submission
+    # -------------------------------------------------------------------------
+
+    def submit(self, tenant_id, fn, *args, batch_size=1, **kwargs):
+        """Queue fn(*args, **kwargs) for a tenant and return a Future.
+
+        `batch_size` is the size of the batch this call belongs to; batches of
+        up to `interactive_batch_size` are served in the priority tier.
+        """
+        tier = "interactive" if batch_size <= self.interactive_batch_size else "bulk"
+        task = _Task(fn, args, kwargs, tier)
+
+        # Checked again under the lock below; this avoids charging the shared
+        # quota for a task that is rejected anyway
+        if self._shutdown:
+            raise RuntimeError("Scheduler has been shut down")
+
+        shared_quota = False
+        if self.store is not None:
+            try:
+                task.store_id = self.store.enqueue(str(tenant_id), tier, self.daily_quota)
+                if task.store_id is None:
+                    task.future.set_exception(self._quota_error())
+                    return task.future
+                shared_quota = True
+            except Exception as e:
+                logger.warning("Scheduler store unavailable, using local limits: %s", e)
+
+        with self._lock:
+            if self._shutdown:
+                if shared_quota:
+                    self._cancel_in_store(task, tenant_id)
+                raise RuntimeError("Scheduler has been shut down")
+
+            tenant = self._tenant(tenant_id)
+            if not shared_quota:
+                today = date.today()
+                if tenant.quota_day != today:
+                    tenant.quota_day, tenant.quota_used = today, 0
+                if self.daily_quota is not None and tenant.quota_used >= self.daily_quota:
+                    task.future.set_exception(self._quota_error())
+                    return task.future
+                tenant.quota_used += 1
+
+            tenant.queues[tier].append(task)
+            if tenant_id not in self._rings[tier]:
+                self._rings[tier].append(tenant_id)
+            self._work_available.notify()
+        return task.future
+
+    def run(self, tenant_id, fn, *args, batch_size=1, **kwargs):
+        """Submit and wait for the result"""
+        return self.submit(tenant_id, fn, *args, batch_size=batch_size, **kwargs).result()
+
+    def shutdown(self, wait=True):
+        """Stop the workers; queued tasks that have not started are cancelled
+
+        Their rows in the shared store are dropped and their quota refunded.
+        """
+        with self._lock:
+            self._shutdown = True
+            for tenant in self._tenants.values():
+                for queue in tenant.queues.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            self._work_available.notify_all()
+        self._stopped.set()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        if self.store is not None:
+            try:
+                self.store.release_all()
+            except Exception as e:
+                logger.warning("Could not release scheduler tasks: %s", e)
+
+    def _cancel_in_store(self, task, tenant_id):
+        try:
+            self.store.cancel(task.store_id, str(tenant_id))
+        except Exception as e:
+            logger.warning("Could not update scheduler store: %s", e)
+
+    def _quota_error(self):
+        return QuotaExceededError(f"Daily quota of {self.daily_quota} analyses reached - try again tomorrow")
+
+    # -------------------------------------------------------------------------
+    # Stats
+    # -------------------------------------------------------------------------
+
+    def stats(self, tenant_id=None):
+        """Per-tenant queue depth, running tasks, quota use and wait times
+
+        `queued`, `running` and `quota_used_today` cover all processes when
+        the shared store is available; wait times are this process's.
+        """
+        shared = {}
+        if self.store is not None:
+            try:
+                shared = self.store.stats(None if tenant_id is None else str(tenant_id))
+            except Exception as e:
+                logger.warning("Scheduler store unavailable for stats: %s", e)
+
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for key, tenant in self._tenants.items():
+                if tenant_id is not None and key != tenant_id:
+                    continue
+                queued = [task for queue in tenant.queues.values() for task in queue]
+                waits = sorted(tenant.waits)
+                row = {
+                    "tenant": key,
+                    "queued": len(queued),
+                    "queued_interactive": len(tenant.queues["interactive"]),
+                    "running": tenant.running,
+                    "completed": tenant.completed,
+                    "quota_used_today": tenant.quota_used if tenant.quota_day == date.today() else 0,
+                    "daily_quota": self.daily_quota,
+                    "oldest_wait_s": round(now - min(t.enqueued_at for t in queued), 1) if queued else 0.0,
+                    "avg_wait_s": round(sum(waits) / len(waits), 2) if waits else None,
+                    "p95_wait_s": round(waits[int(len(waits) * 0.95)], 2) if waits else None,
+                }
+                row.update(shared.pop(str(key), {}))
+                rows.append(row)
+
+        # Tenants with work only in other processes
+        for key, values in shared.items():
+            row = {
+                "tenant": key,
+                "queued_interactive": None,
+                "completed": 0,
+                "daily_quota": self.daily_quota,
+                "oldest_wait_s": None,
+                "avg_wait_s": None,
+                "p95_wait_s": None,
+            }
+            row.update(values)
+            rows.append(row)
+        return rows
+
+    # -------------------------------------------------------------------------
+    # Dispatch
+    # -------------------------------------------------------------------------
+
+    def _tenant(self, tenant_id):
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            tenant = _Tenant(
+                max(float(self.weights.get(str(tenant_id), 1.0)), 0.01),
+                int(self.tenant_limits.get(str(tenant_id), self.tenant_concurrency)),
+            )
+            self._tenants[tenant_id] = tenant
+        return tenant
+
+    def _next_task(self):
+        """Pick the next task by deficit round robin (caller holds the lock)"""
+        for tier in TIERS:
+            ring = self._rings[tier]
+            if not ring:
+                continue
+
+            # Enough visits for the lightest-weighted tenant to earn a turn
+            min_weight = min(self._tenants[key].weight for key in ring)
+            for _ in range(len(ring) * (int(1 / min_weight) + 2)):
+                if not ring:
+                    break
+                key = ring[0]
+                tenant = self._tenants[key]
+                queue = tenant.queues[tier]
+
+                if not queue:
+                    ring.popleft()
+                    tenant.deficit[tier] = 0.0
+                    continue
+                if tenant.running >= tenant.concurrency:
+                    ring.rotate(-1)
+                    continue
+
+                if tenant.deficit[tier] < 1:
+                    tenant.deficit[tier] += tenant.weight
+                if tenant.deficit[tier] < 1:
+                    ring.rotate(-1)
+                    continue
+
+                tenant.deficit[tier] -= 1
+                task = queue.popleft()
+                if not queue:
+                    ring.popleft()
+                    tenant.deficit[tier] = 0.0
+                elif tenant.deficit[tier] < 1:
+                    ring.rotate(-1)
+                return key, tenant, task
+        return None
+
+    def _admit(self, key, task):
+        """Ask the shared store whether the task may start now"""
+        if task.store_id is None or task.future.cancelled():
+            return True
+        try:
+            return self.store.try_start(task.store_id, str(key), task.tier)
+        except Exception as e:
+            logger.warning("Scheduler store unavailable, using local limits: %s", e)
+            return True
+
+    def _requeue(self, key, tenant, task):
+        """Put a task that was not admitted back at the head of its queue (caller holds the lock)
+
+        The tenant goes to the back of the ring so other local tenants whose
+        work may be admitted are tried first.
+        """
+        ring = self._rings[task.tier]
+        tenant.queues[task.tier].appendleft(task)
+        if key not in ring:
+            ring.append(key)
+        elif ring[0] == key:
+            ring.rotate(-1)
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                picked = self._next_task()
+                while picked is None:
+                    if self._shutdown:
+                        return
+                    self._work_available.wait()
+                    picked = self._next_task()
+                key, tenant, task = picked
+                tenant.running += 1
+
+            if not self._admit(key, task):
+                with self._lock:
+                    tenant.running -= 1
+                    self._requeue(key, tenant, task)
+                    # The slot is taken in another process - check again shortly
+                    self._work_available.wait(ADMISSION_POLL_INTERVAL)
+                continue
+
+            waited = time.monotonic() - task.enqueued_at
+            ran = task.future.set_running_or_notify_cancel()
+            if ran:
+                try:
+                    task.future.set_result(task.fn(*task.args, **task.kwargs))
+                except BaseException as e:
+                    task.future.set_exception(e)
+
+            if task.store_id is not None:
+                try:
+                    if ran:
+                        self.store.finish(task.store_id)
+                    else:
+                        self.store.cancel(task.store_id, str(key))
+                except Exception as e:
+                    logger.warning("Could not update scheduler store: %s", e)
+
+            with self._lock:
+                tenant.running -= 1
+                if ran:
+                    tenant.completed += 1
+                    tenant.waits.append(waited)
+                elif task.store_id is None and tenant.quota_day == date.today():
+                    # Cancelled before it started - give the quota back
+                    tenant.quota_used -= 1
+                # A slot under this tenant's cap has freed up
+                self._work_available.notify()
+
+    def _heartbeat(self):
+        """Keep this process's rows in the shared store from being dropped as stale"""
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.store.heartbeat()
+            except Exception as e:
+                logger.warning("Scheduler heartbeat failed: %s", e)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Process-wide scheduler, configured from settings on first use
+
+    With DATABASE_URL set, limits and quotas are shared with every other
+    process through SchedulerStore, and GROQ_CONCURRENCY (default:
+    SCHEDULER_WORKERS) caps the Groq calls in flight across all of them.
+    TENANT_CONCURRENCY_LIMITS ({"<tenant>": n}) overrides TENANT_CONCURRENCY
+    per tenant, e.g. for a nightly CLI import.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            quota = get_setting("TENANT_DAILY_QUOTA")
+            workers = int(get_setting("SCHEDULER_WORKERS", DEFAULT_WORKERS))
+            tenant_concurrency = int(get_setting("TENANT_CONCURRENCY", DEFAULT_TENANT_CONCURRENCY))
+            weights = json.loads(get_setting("TENANT_WEIGHTS", "{}"))
+            tenant_limits = json.loads(get_setting("TENANT_CONCURRENCY_LIMITS", "{}"))
+
+            store = None
+            if get_setting("DATABASE_URL"):
+                store = SchedulerStore(
+                    global_concurrency=int(get_setting("GROQ_CONCURRENCY", workers)),
+                    tenant_concurrency=tenant_concurrency,
+                    reserved_interactive=int(get_setting("INTERACTIVE_RESERVED_SLOTS",
+                                                         DEFAULT_INTERACTIVE_RESERVED_SLOTS)),
+                    weights=weights,
+                    tenant_limits=tenant_limits,
+                )
+
+            _scheduler = FairShareScheduler(
+                workers=workers,
+                tenant_concurrency=tenant_concurrency,
+                daily_quota=int(quota) if quota else None,
+                interactive_batch_size=int(get_setting("INTERACTIVE_BATCH_SIZE", DEFAULT_INTERACTIVE_BATCH_SIZE)),
+                weights=weights,
+                store=store,
+                tenant_limits=tenant_limits,
+            )
+            logger.info("Scheduler started with %d workers (%s limits)", workers,
+                        "shared" if store else "per-process")
+        return _scheduler
@@ -0,0 +1,158 @@
+"""Tests for the fair-share scheduler (no database or Groq access needed)"""
+
+import threading
+import time
+import pytest
+
+from talentscout_scheduler import FairShareScheduler, QuotaExceededError
+
+class MemoryStore:
+    """In-memory stand-in for SchedulerStore that admits every task"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.tasks = {}
+        self.used = {}
+        self.heartbeats = 0
+
+    def enqueue(self, tenant_id, tier, daily_quota=None):
+        with self.lock:
+            if daily_quota is not None and self.used.get(tenant_id, 0) >= daily_quota:
+                return None
+            self.used[tenant_id] = self.used.get(tenant_id, 0) + 1
+            self.next_id += 1
+            self.tasks[self.next_id] = (tenant_id, "queued")
+            return self.next_id
+
+    def try_start(self, task_id, tenant_id, tier):
+        with self.lock:
+            self.tasks[task_id] = (tenant_id, "running")
+            return True
+
+    def finish(self, task_id):
+        with self.lock:
+            self.tasks.pop(task_id, None)
+
+    def cancel(self, task_id, tenant_id):
+        with self.lock:
+            self.tasks.pop(task_id, None)
+            self.used[tenant_id] -= 1
+
+    def heartbeat(self):
+        self.heartbeats += 1
+
+    def release_all(self):
+        with self.lock:
+            for tenant_id, status in self.tasks.values():
+                if status == "queued":
+                    self.used[tenant_id] -= 1
+            self.tasks.clear()
+
+    def stats(self, tenant_id=None):
+        return {}
+
+@pytest.fixture
+def scheduler_factory():
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = FairShareScheduler(**kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+def test_runs_tasks_and_returns_results(scheduler_factory):
+    scheduler = scheduler_factory(workers=2)
+    futures = [scheduler.submit("a", pow, i, 2) for i in range(10)]
+    assert [f.result(timeout=5) for f in futures] == [i * i for i in range(10)]
+
+def test_store_backed_scheduler_does_not_stall(scheduler_factory):
+    # Regression: the heartbeat thread used to swallow the notify() meant for
+    # a worker, leaving submitted tasks queued forever
+    scheduler = scheduler_factory(workers=2, store=MemoryStore())
+    for i in range(50):
+        assert scheduler.submit("a", lambda i=i: i).result(timeout=5) == i
+
+def test_daily_quota_is_enforced_and_refunded_on_cancel(scheduler_factory):
+    scheduler = scheduler_factory(workers=1, daily_quota=2)
+    gate = threading.Event()
+    first = scheduler.submit("a", gate.wait, 5)
+    second = scheduler.submit("a", lambda: "second")
+    with pytest.raises(QuotaExceededError):
+        scheduler.submit("a", lambda: None).result(timeout=5)
+
+    assert second.cancel()
+    gate.set()
+    first.result(timeout=5)
+    # The cancelled task's quota is given back once a worker drops it
+    assert scheduler.submit("a", lambda: "third").result(timeout=5) == "third"
+
+def test_interactive_work_is_served_before_bulk(scheduler_factory):
+    scheduler = scheduler_factory(workers=1, tenant_concurrency=5, interactive_batch_size=3)
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit("bulk-tenant", gate.wait, 5, batch_size=100)
+    bulk = [scheduler.submit("bulk-tenant", order.append, f"bulk{i}", batch_size=100) for i in range(3)]
+    interactive = scheduler.submit("small-tenant", order.append, "interactive", batch_size=1)
+    gate.set()
+    for future in [blocker, interactive] + bulk:
+        future.result(timeout=5)
+    assert order[0] == "interactive"
+
+def test_tenants_share_workers_fairly(scheduler_factory):
+    scheduler = scheduler_factory(workers=1, tenant_concurrency=1)
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit("big", gate.wait, 5, batch_size=100)
+    big = [scheduler.submit("big", order.append, "big", batch_size=100) for _ in range(5)]
+    small = [scheduler.submit("small", order.append, "small", batch_size=100) for _ in range(2)]
+    gate.set()
+    for future in [blocker] + big + small:
+        future.result(timeout=5)
+    # Round robin: the small tenant is not stuck behind the whole big batch
+    assert order.index("small") <= 1
+    assert order[:4].count("small") == 2
+
+def test_tenant_limits_override_the_default_cap(scheduler_factory):
+    scheduler = scheduler_factory(workers=4, tenant_concurrency=1, tenant_limits={"cli": 3})
+    gate = threading.Event()
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        gate.wait(0.2)
+        with lock:
+            running["now"] -= 1
+
+    futures = [scheduler.submit("cli", work, batch_size=100) for _ in range(6)]
+    for future in futures:
+        future.result(timeout=5)
+    assert running["peak"] == 3
+
+def test_shutdown_refunds_queued_tasks_and_rejects_new_ones():
+    store = MemoryStore()
+    scheduler = FairShareScheduler(workers=1, store=store)
+    gate = threading.Event()
+    running = scheduler.submit("a", gate.wait, 5)
+    queued = [scheduler.submit("a", lambda: None) for _ in range(3)]
+    deadline = time.monotonic() + 5
+    while store.tasks.get(1, (None, None))[1] != "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    scheduler.shutdown(wait=False)
+    assert all(future.cancelled() for future in queued)
+    # Only the task that actually started is still charged
+    assert store.used["a"] == 1
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a", lambda: None)
+    assert store.used["a"] == 1
+    gate.set()
+    running.result(timeout=5)